@@ -11,13 +11,23 @@
 
 import streamlit as st
 import pandas as pd
-import altair as alt
+import numpy as np
+import csv
+import io
+import itertools
 import json
+import operator
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # ===== App config =====
 st.set_page_config(page_title="Play Tagger v8.0.5", layout="wide")
 AUTO_DEC_SECONDS = 8  # seconds to auto-decrement after Confirm
+UPLOAD_CHUNK_ROWS = 5000  # rows parsed + pushed per batch on postgame CSV upload
 
 # ---------- Helpers: query params ----------
 def _get_qp():
@@ -67,32 +77,60 @@ sh = None
 sheets_connected = False
 sheets_error = None
 
+def _sheets_http_client():
+    """gspread's HTTPClient, with JSON bodies encoded by orjson when it's installed (stock client otherwise)."""
+    from gspread.http_client import HTTPClient
+    try:
+        import orjson
+    except ImportError:
+        return HTTPClient
+
+    class OrjsonHTTPClient(HTTPClient):
+        def request(self, method, endpoint, params=None, data=None, json=None, files=None, headers=None):
+            if json is not None and data is None and files is None:
+                # values arrays are big lists of str/int: orjson encodes them straight to bytes in C
+                data = orjson.dumps(json, option=orjson.OPT_SERIALIZE_NUMPY)
+                headers = {**(headers or {}), "Content-Type": "application/json"}
+                json = None
+            return super().request(method, endpoint, params=params, data=data, json=json, files=files, headers=headers)
+    return OrjsonHTTPClient
+
+@st.cache_resource(show_spinner=False)
+def _open_sheets():
+    """
+    Authorizes once per server process and keeps the client + spreadsheet handle across reruns and sessions.
+    Failures raise instead of returning, so a bad/missing secret is never cached and the next run tries again.
+    """
+    # 1) creds: either structured block or JSON string
+    if "gcp_service_account" in st.secrets:
+        creds_info = st.secrets["gcp_service_account"]
+    elif "GCP_SERVICE_JSON" in st.secrets:
+        creds_info = json.loads(st.secrets["GCP_SERVICE_JSON"], strict=False)
+    else:
+        raise RuntimeError("Missing secret: gcp_service_account (or GCP_SERVICE_JSON).")
+
+    # only now pull in the Google client stack: local mode (no secrets) never imports it
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    scopes = ["https://www.googleapis.com/auth/spreadsheets"]
+    creds = Credentials.from_service_account_info(creds_info, scopes=scopes)
+    _gc = gspread.authorize(creds, http_client=_sheets_http_client())
+
+    # 2) open sheet by URL or ID
+    url = st.secrets.get("private_gsheets_url")
+    sid = st.secrets.get("SHEET_ID")
+    if url:
+        _sh = _gc.open_by_url(url)
+    elif sid:
+        _sh = _gc.open_by_key(sid)
+    else:
+        raise RuntimeError("Missing SHEET_ID or private_gsheets_url.")
+    return _gc, _sh
+
 def connect_sheets():
     try:
-        import gspread
-        from google.oauth2.service_account import Credentials
-
-        # 1) creds: either structured block or JSON string
-        if "gcp_service_account" in st.secrets:
-            creds_info = st.secrets["gcp_service_account"]
-        elif "GCP_SERVICE_JSON" in st.secrets:
-            creds_info = json.loads(st.secrets["GCP_SERVICE_JSON"], strict=False)
-        else:
-            return None, None, "Missing secret: gcp_service_account (or GCP_SERVICE_JSON)."
-
-        scopes = ["https://www.googleapis.com/auth/spreadsheets"]
-        creds = Credentials.from_service_account_info(creds_info, scopes=scopes)
-        _gc = gspread.authorize(creds)
-
-        # 2) open sheet by URL or ID
-        url = st.secrets.get("private_gsheets_url")
-        sid = st.secrets.get("SHEET_ID")
-        if url:
-            _sh = _gc.open_by_url(url)
-        elif sid:
-            _sh = _gc.open_by_key(sid)
-        else:
-            return None, None, "Missing SHEET_ID or private_gsheets_url."
+        _gc, _sh = _open_sheets()
         return _gc, _sh, None
     except Exception as e:
         return None, None, str(e)
@@ -101,85 +139,391 @@ gc, sh, sheets_error = connect_sheets()
 sheets_connected = sheets_error is None
 st.caption("✅ Google Sheets connected." if sheets_connected else f"⚠️ Local mode. {('Reason: ' + sheets_error) if sheets_error else ''}")
 
-GAME_HEADERS = [
+SHEETS_RETRY_STATUS = (429, 500, 503)  # quota + transient backend errors
+SHEETS_APPEND_RETRY_STATUS = (429,)   # appends aren't idempotent: a 5xx may come back after the rows landed
+SHEETS_WRITES_PER_MIN = 60      # per-user write quota
+SHEETS_WRITE_BATCH_ROWS = 1000  # rows per append request on bulk pushes
+SHEETS_FLUSH_ROWS = 10          # buffered possessions sent as one append once this many are queued...
+SHEETS_FLUSH_SECONDS = 3        # ...or once the oldest has waited this long
+
+def _with_retry(fn, *args, _tries:int=5, _retry_on:tuple=SHEETS_RETRY_STATUS, **kwargs):
+    """
+    Calls a gspread method, backing off (exponential + jitter) on 429/5xx APIErrors
+    so a transient quota hit doesn't lose the write or push the user into retrying.
+    Appends pass _retry_on=SHEETS_APPEND_RETRY_STATUS so a retry can't duplicate rows.
+    """
+    import gspread
+    for i in range(_tries):
+        try:
+            return fn(*args, **kwargs)
+        except gspread.exceptions.APIError as e:
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            if status not in _retry_on or i == _tries - 1:
+                raise
+            time.sleep((2 ** i) * 0.25 + random.random() * 0.1)
+
+@st.cache_resource
+def _write_pacer() -> dict:
+    # module globals reset on every rerun; this outlives them and is shared with the Sheets writer thread
+    return {"lock": threading.Lock(), "last": 0.0}
+
+WRITE_PACER = _write_pacer()  # resolved here on the script thread, like WS_HANDLES
+
+def _pace_write():
+    """Spaces bulk writes (across calls, reruns and the writer thread) to stay under SHEETS_WRITES_PER_MIN."""
+    with WRITE_PACER["lock"]:
+        wait = 60 / SHEETS_WRITES_PER_MIN - (time.monotonic() - WRITE_PACER["last"])
+        if wait > 0:
+            time.sleep(wait)
+        WRITE_PACER["last"] = time.monotonic()
+
+GAME_HEADERS = (
     "Timestamp","Plays","Credit Play","Call Type","Caller","Outcome","Points",
     "2nd Chance?","2nd Chance Outcome","Quarter","Opponent","Game Type","Success"
-]
+)
+
+GAME_CATEGORY_COLS = ("Credit Play","Call Type","Caller","Outcome","Quarter","Game Type","Success")  # few distinct values per game
+
+_category_idx = tuple(GAME_HEADERS.index(c) for c in GAME_CATEGORY_COLS)
+
+POINTS_COL = GAME_HEADERS.index("Points")
+
+def points_cell(v) -> int:
+    """Uploaded Points cell -> int (blank / junk -> 0)."""
+    try:
+        return int(float(v))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+# upload marshaller, built once from the schema: the columns either side of Points come out through
+# itemgetters (C), Points is coerced inline, so each CSV row is a single pass
+_pre_points_getter = operator.itemgetter(*GAME_HEADERS[:POINTS_COL])
+_post_points_getter = operator.itemgetter(*GAME_HEADERS[POINTS_COL + 1:])
+
+def upload_row(r:dict) -> list:
+    """CSV record (all GAME_HEADERS keys present) -> Sheets row with Points as int."""
+    return [*_pre_points_getter(r), points_cell(r["Points"]), *_post_points_getter(r)]
 
 def ensure_core_tabs():
     if not sheets_connected: return
     ws_names = [ws.title for ws in sh.worksheets()]
     if "Playbook" not in ws_names:
-        sh.add_worksheet("Playbook", rows=2000, cols=3)
-        sh.worksheet("Playbook").update("A1:C1", [["Code","Play Name","System"]])
+        ws = _with_retry(sh.add_worksheet, "Playbook", rows=2000, cols=3)
+        _with_retry(ws.update, "A1:C1", [["Code","Play Name","System"]])
     if "Games" not in ws_names:
-        sh.add_worksheet("Games", rows=3000, cols=4)
-        sh.worksheet("Games").update("A1:D1", [["Game Name","Type","Opponent","Created At"]])
+        ws = _with_retry(sh.add_worksheet, "Games", rows=3000, cols=4)
+        _with_retry(ws.update, "A1:D1", [["Game Name","Type","Opponent","Created At"]])
     if "Roster" not in ws_names:
-        sh.add_worksheet("Roster", rows=200, cols=1)
-        sh.worksheet("Roster").update("A1:A1", [["Player"]])
+        ws = _with_retry(sh.add_worksheet, "Roster", rows=200, cols=1)
+        _with_retry(ws.update, "A1:A1", [["Player"]])
+
+@st.cache_resource(show_spinner=False)
+def core_tabs_ready() -> bool:
+    """Runs ensure_core_tabs once per server process (not per rerun); a failure isn't cached, so it retries."""
+    ensure_core_tabs()
+    return True
 
 def game_ws_title(name:str) -> str:
     return f"Game - {name}"
 
-def get_or_create_game_ws(name:str):
+@st.cache_resource
+def _ws_handles() -> dict:
+    """Tab title -> Worksheet, shared across reruns and sessions like the spreadsheet handle itself."""
+    return {}
+
+@st.cache_resource
+def _ws_create_lock():
+    # the script thread and the Sheets writer can both miss on the same new tab; only one may create it
+    return threading.Lock()
+
+WS_HANDLES = _ws_handles() if sheets_connected else {}
+
+def core_ws(title:str):
+    """Playbook / Games handle, opened once per process and reused from WS_HANDLES after that."""
+    ws = WS_HANDLES.get(title)
+    if ws is None:
+        ws = WS_HANDLES[title] = _with_retry(sh.worksheet, title)
+    return ws
+
+@st.cache_data(ttl=60, show_spinner=False)
+def sheets_ws_titles() -> list:
+    """Tab titles for the status panel; cleared whenever this app adds a tab."""
+    return [ws.title for ws in _with_retry(sh.worksheets)]
+
+def get_or_create_game_ws(name:str, create:bool=True):
+    """Cached handle for a game's tab; a missing tab is created (create=False: None, nothing written)."""
     ws_title = game_ws_title(name)
-    ws_names = [ws.title for ws in sh.worksheets()]
-    if ws_title not in ws_names:
-        ws = sh.add_worksheet(ws_title, rows=6000, cols=len(GAME_HEADERS))
-        ws.update("A1:M1", [GAME_HEADERS])
-    else:
-        ws = sh.worksheet(ws_title)
-        if ws.row_values(1) != GAME_HEADERS:
-            ws.update("A1:M1", [GAME_HEADERS])
+    ws = WS_HANDLES.get(ws_title)
+    if ws is not None:
+        return ws
+    # first use of this tab in the process: open (or create) it and check the header once
+    import gspread
+    with _ws_create_lock():
+        ws = WS_HANDLES.get(ws_title)
+        if ws is not None:
+            return ws
+        try:
+            ws = _with_retry(sh.worksheet, ws_title)
+        except gspread.exceptions.WorksheetNotFound:
+            if not create:
+                return None
+            ws = _with_retry(sh.add_worksheet, ws_title, rows=6000, cols=len(GAME_HEADERS))
+            _with_retry(ws.update, "A1:M1", [list(GAME_HEADERS)])
+            sheets_ws_titles.clear()
+        else:
+            if ws.row_values(1) != list(GAME_HEADERS):
+                _with_retry(ws.update, "A1:M1", [list(GAME_HEADERS)])
+        WS_HANDLES[ws_title] = ws
     return ws
 
 def sheets_append_play(game_name:str, row:list):
     ws = get_or_create_game_ws(game_name)
-    ws.append_row(row, value_input_option="USER_ENTERED")
+    _with_retry(ws.append_row, row, value_input_option="USER_ENTERED", _retry_on=SHEETS_APPEND_RETRY_STATUS)
 
-def sheets_overwrite_game(game_name:str, df:pd.DataFrame):
+def sheets_append_plays_batch(game_name:str, rows:list):
+    """Appends many possession rows, SHEETS_WRITE_BATCH_ROWS per values.append call, paced for the quota."""
+    if not rows: return
     ws = get_or_create_game_ws(game_name)
-    ws.resize(rows=1)
-    if df.empty:
-        ws.update("A1:M1", [GAME_HEADERS]); return
-    for c in GAME_HEADERS:
-        if c not in df.columns: df[c] = ""
-    df = df[GAME_HEADERS].fillna("")
-    values = [GAME_HEADERS] + df.values.tolist()
-    ws.update(f"A1:M{len(values)}", values)
+    for i in range(0, len(rows), SHEETS_WRITE_BATCH_ROWS):
+        _pace_write()
+        _with_retry(ws.append_rows, rows[i:i + SHEETS_WRITE_BATCH_ROWS], value_input_option="USER_ENTERED",
+                    _retry_on=SHEETS_APPEND_RETRY_STATUS)
+
+def flush_pending(force:bool=False) -> bool:
+    """
+    Hands buffered possessions (ss["pending_sheet_rows"]: game -> list[tuple]) to the Sheets writer thread,
+    one append per game, once SHEETS_FLUSH_ROWS are queued or the oldest has waited SHEETS_FLUSH_SECONDS
+    (force: right away). The run doesn't wait for the HTTPS call. Returns True if anything was submitted.
+    """
+    collect_inflight()
+    buf = ss["pending_sheet_rows"]
+    if not buf: return False
+    if not force and sum(map(len, buf.values())) < SHEETS_FLUSH_ROWS \
+            and time.monotonic() - ss["pending_since"] < SHEETS_FLUSH_SECONDS:
+        return False
+    for game in list(buf):
+        rows = buf.pop(game)
+        fut = sheets_executor().submit(sheets_append_plays_batch, game, rows)
+        ss["inflight"].append((fut, game, rows))
+    ss["pending_since"] = None
+    return True
+
+def collect_inflight(wait_game:str=None):
+    """
+    Settles background appends that have finished (wait_game: also waits for that game's appends, not for
+    anything else queued on the writer). A failed batch goes back to the front of its game's buffer for the
+    next flush; a successful one drops the cached game reads.
+    """
+    still = []
+    for fut, game, rows in ss["inflight"]:
+        if not (game == wait_game or fut.done()):
+            still.append((fut, game, rows))
+            continue
+        try:
+            fut.result()
+            read_game_from_sheets.clear()
+        except Exception as e:
+            ss["pending_sheet_rows"][game] = rows + ss["pending_sheet_rows"].get(game, [])
+            if ss["pending_since"] is None:
+                ss["pending_since"] = time.monotonic()
+            st.toast(f"⚠️ Sheets append failed (will retry): {e}")
+    ss["inflight"] = still
+    jobs = []
+    for fut, what in ss["sheets_jobs"]:
+        if not fut.done():
+            jobs.append((fut, what))
+            continue
+        try:
+            fut.result()
+        except Exception as e:
+            st.toast(f"⚠️ Sheets {what} failed: {e}")
+    ss["sheets_jobs"] = jobs
+
+def submit_sheets_job(what:str, fn, *args):
+    """Queues a one-off Sheets write behind the buffered appends; a failure is toasted on a later run."""
+    ss["sheets_jobs"].append((sheets_executor().submit(fn, *args), what))
+
+def game_records(game_name:str, df_h:pd.DataFrame) -> list:
+    """
+    Sheet rows for a game as possession tuples (GAME_HEADERS order), plus anything still waiting to be written.
+    Call collect_inflight(wait_game=game_name) before reading df_h, so no append lands between the read and
+    this call and gets counted twice.
+    """
+    cols = [df_h[c].tolist() if c in df_h else [""] * len(df_h) for c in GAME_HEADERS]
+    # tolist hands back a fresh str per cell; intern the label columns so repeats share one object
+    for i in _category_idx:
+        cols[i] = [sys.intern(v) if type(v) is str else v for v in cols[i]]
+    recs = list(zip(*cols))
+    # rows still on their way to the tab (in flight or buffered) aren't in this read yet; a finished append
+    # counts as in flight until collect_inflight settles it and drops the (possibly stale) cached read
+    sending = [r for fut, g, rows in ss["inflight"] if g == game_name for r in rows]
+    return recs + sending + ss["pending_sheet_rows"].get(game_name, [])
+
+TIMESTAMP_COL = GAME_HEADERS.index("Timestamp")
+
+def _clock_key(v) -> str:
+    """Game clock as H:MM, whether it reads back as typed or as a Sheets time ("11:52:00", "11:52:00 AM")."""
+    parts = str(v).strip().split(" ")[0].split(":")
+    return ":".join([parts[0].lstrip("0") or "0", *parts[1:2]])
+
+def same_row(cells:list, rec:tuple) -> bool:
+    """A row read back from a game tab (formatted strings, trailing blanks trimmed) matches a possession tuple."""
+    cells = [str(c) for c in cells]
+    vals = [str(v) for v in rec]
+    while cells and cells[-1] == "": cells.pop()
+    while vals and vals[-1] == "": vals.pop()
+    if len(cells) != len(vals): return False
+    # USER_ENTERED turns the clock into a time value, so it can come back reformatted
+    t = TIMESTAMP_COL
+    return cells[:t] + cells[t + 1:] == vals[:t] + vals[t + 1:] and _clock_key(cells[t]) == _clock_key(vals[t])
+
+def sheets_overwrite_game(game_name:str, rows:list):
+    """
+    Replaces a game tab with header + rows (2D, GAME_HEADERS order): one clear, then the values
+    SHEETS_WRITE_BATCH_ROWS per paced update.
+    """
+    ws = get_or_create_game_ws(game_name)
+    values = [list(GAME_HEADERS)] + rows
+    _with_retry(ws.clear)
+    if len(values) > ws.row_count:
+        # grow the grid first: a values.update past the last grid row is rejected rather than expanded
+        _with_retry(ws.resize, rows=len(values))
+    # bounded request bodies on a big upload; a normal game is still one update
+    for i in range(0, len(values), SHEETS_WRITE_BATCH_ROWS):
+        block = values[i:i + SHEETS_WRITE_BATCH_ROWS]
+        _pace_write()
+        _with_retry(ws.update, f"A{i + 1}:M{i + len(block)}", block, value_input_option="USER_ENTERED")
+
+def sheets_save_playbook(rows:list) -> bool:
+    """
+    Writes Playbook as header + rows ([code, name, system]), diffed against a fresh read of the tab:
+    one values.update from the first changed row to the end of whichever is longer (blanks clear the old
+    tail), or no write at all when nothing changed. Returns True if it wrote.
+    """
+    ws = core_ws("Playbook")
+    sheets_read_core.clear()
+    pb = sheets_read_core()[0]
+    cols = ["Code","Play Name","System"]
+    old = [cols] + pb.reindex(columns=cols, fill_value="").to_numpy(dtype=object).tolist() if len(pb.columns) else []
+    values = [cols] + rows
+    start = next((i for i, (a, b) in enumerate(zip(old, values)) if a != b), min(len(old), len(values)))
+    end = max(len(old), len(values))
+    if start == end:
+        return False
+    values = values[start:] + [["", "", ""]] * (len(old) - len(values))  # "" clears the cell
+    if end > ws.row_count:
+        _with_retry(ws.resize, rows=end)
+    _pace_write()
+    _with_retry(ws.update, f"A{start + 1}:C{end}", values, value_input_option="RAW")
+    sheets_read_core.clear()
+    return True
 
 def sheets_add_game(game_name:str, game_type:str, opponent:str):
-    games = sh.worksheet("Games")
-    games.append_row([game_name, game_type, opponent, datetime.now().isoformat(timespec="seconds")],
-                     value_input_option="USER_ENTERED")
-    get_or_create_game_ws(game_name)
+    games = core_ws("Games")
+    _with_retry(games.append_row, [game_name, game_type, opponent, datetime.now().isoformat(timespec="seconds")],
+                value_input_option="USER_ENTERED", _retry_on=SHEETS_APPEND_RETRY_STATUS)
+    sheets_read_core.clear()
+    # the tab itself is created by the first append (get_or_create_game_ws), not here
+
+def upload_csv_to_sheets(up, game_name:str, overwrite:bool):
+    """
+    Streams an uploaded CSV into a game tab (UPLOAD_CHUNK_ROWS at a time; first chunk overwrites if asked).
+    Returns (rows uploaded, missing columns). Runs on the upload executor, so no st.* calls in here.
+    """
+    # stdlib csv straight off the upload stream: no DataFrame, one chunk of row lists in memory at a time
+    text = io.TextIOWrapper(up, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.DictReader(text, restval="")
+        # validate the header up front so a malformed CSV never burns write quota
+        missing = [c for c in GAME_HEADERS if c not in (reader.fieldnames or ())]
+        if missing:
+            return 0, missing
+        n_up = 0
+        while True:
+            rows = [upload_row(r) for r in itertools.islice(reader, UPLOAD_CHUNK_ROWS)]
+            if not rows:
+                break
+            if overwrite and n_up == 0:
+                sheets_overwrite_game(game_name, rows)
+            else:
+                sheets_append_plays_batch(game_name, rows)
+            n_up += len(rows)
+            del rows  # shipped: drop this chunk before the next one is parsed, so peak stays at one chunk
+        return n_up, []
+    finally:
+        # done with the bytes either way; the next rerun gets a fresh UploadedFile from the uploader
+        text.detach()
+        up.close()
+
+@st.cache_resource
+def sheets_executor():
+    # one worker for every background Sheets write (possession appends, uploads): they share one per-user
+    # write quota, and a single queue keeps them landing in the order they were made
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="sheets-writer")
 
 @st.cache_data(ttl=5, show_spinner=False)
+def sheets_read_core() -> tuple:
+    """Playbook!A:C and Games!A:D in one values.batchGet -> (playbook_df, games_df); blanks come back as ""."""
+    resp = _with_retry(sh.values_batch_get, ["Playbook!A:C", "Games!A:D"])
+    frames = []
+    for vr in resp.get("valueRanges", []):
+        vals = vr.get("values", [])
+        if not vals:
+            frames.append(pd.DataFrame())
+            continue
+        # the values API drops trailing blank cells: pad every row to the header's width ourselves
+        # (pandas only pads when some row is full width, and raises when none is)
+        w = len(vals[0])
+        frames.append(pd.DataFrame([(r + [""] * w)[:w] for r in vals[1:]], columns=vals[0]))
+    return tuple(frames)
+
 def sheets_list_games_df():
     if not sheets_connected: return pd.DataFrame()
     try:
-        return pd.DataFrame(sh.worksheet("Games").get_all_records())
+        return sheets_read_core()[1]
     except Exception:
         return pd.DataFrame()
 
 @st.cache_data(ttl=5, show_spinner=False)
 def read_game_from_sheets(game_name:str, _bust:int=0):
+    """One values.get of A:M into a typed frame: Points int32, the repeated label columns categorical."""
     if not sheets_connected: return pd.DataFrame()
-    ws = get_or_create_game_ws(game_name)
-    rows = ws.get_all_records()
-    return pd.DataFrame(rows)
+    ws = get_or_create_game_ws(game_name, create=False)
+    if ws is None: return pd.DataFrame()  # no tab yet: nothing logged to Sheets for this game
+    vals = _with_retry(ws.get_values, "A:M")
+    if len(vals) < 2: return pd.DataFrame()
+    df = pd.DataFrame(vals[1:], columns=vals[0])
+    # blank/garbled Points or Success (hand-edited tabs, old uploads) are derived from Outcome, column-wise
+    if "Points" in df:
+        pts = pd.to_numeric(df["Points"], errors="coerce")
+        if "Outcome" in df:
+            pts = pts.fillna(df["Outcome"].map(OUTCOME_POINTS))
+        df["Points"] = pts.fillna(0).astype("int32")
+    if "Success" in df and "Outcome" in df:
+        blank = ~df["Success"].isin(("Yes", "No"))
+        if blank.any():
+            df.loc[blank, "Success"] = np.where(df.loc[blank, "Outcome"].isin(SUCCESS_OUTCOMES), "Yes", "No")
+    for c in GAME_CATEGORY_COLS:
+        if c in df: df[c] = df[c].astype("category")
+    return df
 
 # ===== Domain constants =====
-CALL_TYPES_MASTER = ["Early Offense","Half Court","BLOB","SLOB","Zone"]
-CALLERS = ["Coach","Player"]
-QUARTERS = ["Q1","Q2","Q3","Q4","OT"]
-SC_OUTCOMES = ["Made 2","Missed 2","Made 3","Missed 3","Foul","Turnover","Reset/Other"]
+CALL_TYPES_MASTER = ("Early Offense","Half Court","BLOB","SLOB","Zone")
+CALLERS = ("Coach","Player")
+QUARTERS = ("Q1","Q2","Q3","Q4","OT")
+GAME_TYPES = ("Game","Scrimmage","Scout")
+QUARTER_IDX = {q: i for i, q in enumerate(QUARTERS)}     # selectbox index lookups without a list scan
+GAME_TYPE_IDX = {t: i for i, t in enumerate(GAME_TYPES)}
+CLOCK_MINUTES = tuple(range(12, -1, -1))
+CLOCK_SECONDS = tuple(f"{s:02d}" for s in range(0, 60, 5))
+SC_OUTCOMES = ("Made 2","Missed 2","Made 3","Missed 3","Foul","Turnover","Reset/Other")
+OUTCOME_POINTS = {"Made 2": 2, "Made 3": 3, "Foul (Made 1/2)": 1, "Foul (Made 2/2)": 2}
+SUCCESS_OUTCOMES = frozenset(OUTCOME_POINTS)
 
 def points_from_outcome(o:str) -> int:
-    return 2 if o=="Made 2" else 3 if o=="Made 3" else 1 if o=="Foul (Made 1/2)" else 2 if o=="Foul (Made 2/2)" else 0
+    return OUTCOME_POINTS.get(o, 0)
 def is_success(outcome:str) -> bool:
-    return outcome in ["Made 2","Made 3","Foul (Made 1/2)","Foul (Made 2/2)"]
+    return outcome in SUCCESS_OUTCOMES
 
 # ===== Play categories (your list) =====
 USER_PLAY_CATEGORIES = {
@@ -191,42 +535,69 @@ USER_PLAY_CATEGORIES = {
 UNCATEGORIZED = "Uncategorized"
 
 # ===== Chip helper =====
-def chip_check_group(label, options, key, cols=4, default_selected=None, small=False):
-    if label: st.markdown(f"**{label}**")
+def chip_check_group(label, options, key, cols=4, default_selected=None, small=False, multiselect=False):
+    # multiselect: long groups (the play categories) render as one multiselect unless "Play chips" is on
     if default_selected is None: default_selected = []
     st.session_state.setdefault(key, set(default_selected))
-    selected = set(st.session_state[key])
-    col_list = st.columns(cols)
-    pad = "6px 10px" if small else "8px 12px"
-    st.markdown(f"<style>div[data-key^='{key}__'] label{{padding:{pad} !important;}}</style>", unsafe_allow_html=True)
-    for i, opt in enumerate(options):
-        with col_list[i % cols]:
-            checked = st.checkbox(opt, value=(opt in selected), key=f"{key}__{opt}")
-            if checked: selected.add(opt)
-            else: selected.discard(opt)
+    if multiselect and not st.session_state["play_chips"]:
+        return chip_multiselect(label, options, key)
+    # keyed container -> "st-key-chips_sm_…" class, so the static APP_CSS rule sizes small groups (no per-call <style>)
+    with st.container(key=f"chips_{'sm' if small else 'lg'}_{key}"):
+        if label: st.markdown(f"**{label}**")
+        selected = set(st.session_state[key])
+        col_list = st.columns(cols)
+        for i, opt in enumerate(options):
+            with col_list[i % cols]:
+                checked = st.checkbox(opt, value=(opt in selected), key=f"{key}__{opt}")
+                if checked: selected.add(opt)
+                else: selected.discard(opt)
     st.session_state[key] = selected
     return sorted(selected)
 
+def chip_multiselect(label, options, key):
+    """chip_check_group as one multiselect (one widget per group instead of one checkbox per option)."""
+    ms_key = f"{key}__ms"
+    def _sync():
+        # options hidden by the search aren't in the widget, so only the visible ones are replaced
+        st.session_state[key] = (st.session_state[key] - set(options)) | set(st.session_state[ms_key])
+    selected = st.session_state[key]
+    st.session_state[ms_key] = [o for o in options if o in selected]
+    st.multiselect(label or "Select", options, key=ms_key, on_change=_sync,
+                   label_visibility="visible" if label else "collapsed")
+    return sorted(selected)
+
 # ===== State =====
 ss = st.session_state
-MASTER_PLAYS = sorted({p for lst in USER_PLAY_CATEGORIES.values() for p in lst})
-ss.setdefault("plays_master", MASTER_PLAYS.copy())
-ss.setdefault("play_categories", USER_PLAY_CATEGORIES.copy())
+if "plays_master" not in ss:  # build the mutable copies only on first run; later reruns skip the sort
+    ss["plays_master"] = sorted({p for lst in USER_PLAY_CATEGORIES.values() for p in lst})
+if "play_categories" not in ss:
+    ss["play_categories"] = {k: list(v) for k, v in USER_PLAY_CATEGORIES.items()}
 ss.setdefault("games", ["Default Game"])
+if "games_idx" not in ss:  # game name -> selectbox index, kept in step wherever ss["games"] changes
+    ss["games_idx"] = {n: i for i, n in enumerate(ss["games"])}
 ss.setdefault("game_meta", {})      # name -> {"quarter","opponent","type"}
 ss.setdefault("current_game", "Default Game")
-ss.setdefault("game_data", {})      # name -> list[dict]
+ss.setdefault("game_data", {})      # name -> list[tuple] in GAME_HEADERS order
 ss.setdefault("roster", ["#1","#2","#3"])
 ss.setdefault("game_clock_min", 12)
 ss.setdefault("game_clock_sec", "00")
 ss.setdefault("pending_action", None)
 ss.setdefault("credit_play", None)
 ss.setdefault("sheet_rev", 0)
+ss.setdefault("pending_sheet_rows", {})  # game -> possessions logged locally, not yet appended to Sheets
+ss.setdefault("pending_since", None)     # monotonic time the oldest buffered possession was queued
+ss.setdefault("inflight", [])            # (future, game, rows) appends running on the Sheets writer thread
+ss.setdefault("plays_lower", {})          # play name -> lowercase, for the plays search
+ss.setdefault("hydrated_games", set())   # games already read from Sheets this session
+ss.setdefault("sheets_jobs", [])         # (future, label) other writes queued on the same thread
 ss.setdefault("hide_create_row", False)
 ss.setdefault("compact_mode", True)
+ss.setdefault("play_chips", False)       # one checkbox per play instead of a multiselect per category
 
 # ===== CSS =====
-st.markdown("""
+# One constant stylesheet. st.html ships style-only HTML through the event container,
+# so it skips the markdown parse and takes no layout space.
+APP_CSS = """
 <style>
 :root{
   --chip-gray:#e5e7eb; --chip-gray-fg:#111111; --chip-gray-border:#cfd4dc; --chip-gray-hover:#f3f4f6;
@@ -245,6 +616,7 @@ div[data-testid="stCheckbox"] label{
   transition:background .15s,color .15s,border-color .15s,box-shadow .15s,transform .02s;
 }
 div[data-testid="stCheckbox"] svg{display:none !important;}
+div[class*="st-key-chips_sm_"] div[data-testid="stCheckbox"] label{padding:6px 10px !important;}
 div[data-testid="stCheckbox"] label:hover{background:var(--chip-gray-hover);}
 div[data-testid="stCheckbox"]:has(input:checked) label{
   background:var(--chip-red);color:var(--chip-red-fg) !important;border-color:var(--chip-red-border);box-shadow:0 2px 6px rgba(239,68,68,.35);
@@ -258,45 +630,54 @@ div[data-testid="stCheckbox"]:has(input:checked) label{
 @media (prefers-color-scheme: dark){ .top-sticky{ background:rgba(17,24,39,0.90); border-bottom:1px solid rgba(255,255,255,.06);} }
 .bottom-sticky{position:sticky; bottom:0; z-index:60; padding:8px 6px; background:rgba(255,255,255,0.92); backdrop-filter: blur(6px); border-top:1px solid rgba(0,0,0,.06);}
 @media (prefers-color-scheme: dark){ .bottom-sticky{ background:rgba(17,24,39,0.92); border-top:1px solid rgba(255,255,255,.06);} }
-.compact .block-container{ padding-top:10px !important; padding-bottom:56px !important;}
 .clock .stButton > button{ padding:4px 8px !important; font-size:0.90rem !important; min-width:44px !important; }
 .clock .stColumns{ margin-bottom:4px !important; }
 </style>
-""", unsafe_allow_html=True)
-if ss["compact_mode"]:
-    st.markdown('<style>.block-container{padding-top:10px !important; padding-bottom:56px !important;}</style>', unsafe_allow_html=True)
+"""
+# compact mode is the same sheet plus the tighter page padding: one style element per run either way
+APP_CSS_COMPACT = APP_CSS.replace("</style>", ".block-container{ padding-top:10px !important; padding-bottom:56px !important;}\n</style>")
+st.html(APP_CSS_COMPACT if ss["compact_mode"] else APP_CSS)
 
 # ===== Init Sheets + baseline tabs + hydrate Playbook/Games =====
 if sheets_connected:
-    ensure_core_tabs()
+    core_tabs_ready()
     try:
-        pb = pd.DataFrame(sh.worksheet("Playbook").get_all_records())
+        pb = sheets_read_core()[0]
         if not pb.empty and "Play Name" in pb:
             names = pb["Play Name"].dropna().astype(str).str.strip().tolist()
             if names:
-                ss["plays_master"] = sorted(set(ss["plays_master"]) | set(names))
-        if not pb.empty and "System" in pb:
-            cat = {}
-            for _, r in pb.iterrows():
-                nm = str(r.get("Play Name","")).strip()
-                sys = str(r.get("System","")).strip() or UNCATEGORIZED
-                if nm: cat.setdefault(sys, []).append(nm)
+                new_master = sorted(set(ss["plays_master"]) | set(names))
+                if new_master != ss["plays_master"]:
+                    ss["plays_master"] = new_master
+        if not pb.empty and "System" in pb and "Play Name" in pb:
+            nms = pb["Play Name"].astype(str).str.strip()
+            systems = pb["System"].astype(str).str.strip().replace("", UNCATEGORIZED)
+            keep = nms.ne("")
+            # systems in first-seen order, names grouped in one pass (no per-row Series)
+            cat = {system: g.tolist() for system, g in nms[keep].groupby(systems[keep], sort=False)}
             if cat:
-                ss["play_categories"] = {k: sorted(set(v)) for k,v in cat.items()}
+                new_cat = {k: sorted(set(v)) for k,v in cat.items()}
+                if new_cat != ss["play_categories"]:
+                    ss["play_categories"] = new_cat
     except Exception:
         pass
     try:
         games_df = sheets_list_games_df()
         if not games_df.empty:
-            for r in games_df.to_dict("records"):
-                name = r.get("Game Name")
-                if name and name not in ss["games"]:
-                    ss["games"].append(name)
+            # plain tuples straight from the columns — no per-row dict
+            cols = games_df.reindex(columns=["Game Name","Type","Opponent"], fill_value="")
+            names = set()
+            for name, gtype, opp in cols.itertuples(index=False, name=None):
                 if name:
+                    names.add(name)
                     meta = ss["game_meta"].setdefault(name, {})
-                    if r.get("Type"): meta["type"] = r["Type"]
-                    if r.get("Opponent"): meta["opponent"] = r["Opponent"]
-            ss["games"] = sorted(set(ss["games"]))
+                    if gtype: meta["type"] = gtype
+                    if opp: meta["opponent"] = opp
+            # only reassign when the sheet actually added a game
+            new_games = sorted(set(ss["games"]) | names)
+            if new_games != ss["games"]:
+                ss["games"] = new_games
+                ss["games_idx"] = {n: i for i, n in enumerate(new_games)}
     except Exception:
         pass
 
@@ -308,12 +689,26 @@ with cimg:
 
 # ===== Utilities =====
 def next_quarter(q:str) -> str:
-    try: i = QUARTERS.index(q)
-    except ValueError: i = 0
-    return QUARTERS[min(i+1, len(QUARTERS)-1)]
+    return QUARTERS[min(QUARTER_IDX.get(q, 0) + 1, len(QUARTERS) - 1)]
 
 def join_pipe(items): return " | ".join(items) if items else ""
 
+def add_play(nm:str, cat:str) -> bool:
+    """Adds a play to the session playbook and appends it to the Playbook tab; False (no write) if it's already there."""
+    if nm in ss["play_categories"].get(cat, ()):
+        return False
+    if nm not in ss["plays_master"]:
+        ss["plays_master"].append(nm); ss["plays_master"].sort()
+    ss["play_categories"][cat] = sorted(set(ss["play_categories"].get(cat, [])) | {nm})
+    if sheets_connected:
+        try:
+            _with_retry(core_ws("Playbook").append_row, ["", nm, cat], value_input_option="USER_ENTERED",
+                        _retry_on=SHEETS_APPEND_RETRY_STATUS)
+            sheets_read_core.clear()
+        except Exception as e:
+            st.warning(f"Could not write to Playbook: {e}")
+    return True
+
 # ===== Determine current game (URL param -> latest fallback) =====
 qp = _get_qp()
 qp_game = None
@@ -331,23 +726,31 @@ def most_recent_game_name():
     except Exception:
         return None
 
-if qp_game and qp_game in ss["games"]:
+if qp_game and qp_game in ss["games_idx"]:
     ss["current_game"] = qp_game
 elif sheets_connected:
     mr = most_recent_game_name()
     if mr: ss["current_game"] = mr
 else:
-    if ss["current_game"] not in ss["games"]:
+    if ss["current_game"] not in ss["games_idx"]:
         ss["current_game"] = ss["games"][0]
 
-_set_qp(game=ss["current_game"])
+if qp_game != ss["current_game"]:  # only touch the URL when it's out of date
+    _set_qp(game=ss["current_game"])
 
-# ALWAYS rehydrate on game selection (strong persistence)
+# settle finished background appends; send any buffered possessions that have waited long enough
 if sheets_connected:
+    flush_pending()
+
+# hydrate from Sheets once per game per session (fresh load / ?game= link), even if the tab turns out empty;
+# after that ss["game_data"] is authoritative and only a game switch or upload re-reads the tab
+if sheets_connected and ss["current_game"] not in ss["hydrated_games"] and not ss["game_data"].get(ss["current_game"]):
     try:
         df_h = read_game_from_sheets(ss["current_game"])
+        ss["hydrated_games"].add(ss["current_game"])
         if not df_h.empty:
-            ss["game_data"][ss["current_game"]] = df_h.to_dict("records")
+            ss["game_data"][ss["current_game"]] = game_records(ss["current_game"], df_h)
+            ss["sheet_rev"] += 1
     except Exception:
         pass
 
@@ -355,27 +758,33 @@ if sheets_connected:
 st.markdown('<div class="top-sticky">', unsafe_allow_html=True)
 gc1, gc2, gc3, gc4, gc5, gc6 = st.columns([2,1,2,1,1,1])
 with gc1:
-    current_game = st.selectbox("Current Game", options=ss["games"], index=ss["games"].index(ss["current_game"]) if ss["current_game"] in ss["games"] else 0)
+    current_game = st.selectbox("Current Game", options=ss["games"], index=ss["games_idx"].get(ss["current_game"], 0))
     if current_game != ss["current_game"]:
         ss["current_game"] = current_game
         _set_qp(game=ss["current_game"])
         if sheets_connected:
+            # this game's appends must land (or fall back into the buffer) before the read, or one could
+            # land between the two and be counted both in the read and as still sending
+            collect_inflight(wait_game=ss["current_game"])
             df_h = read_game_from_sheets(ss["current_game"])
-            ss["game_data"][ss["current_game"]] = df_h.to_dict("records") if not df_h.empty else []
+            ss["game_data"][ss["current_game"]] = game_records(ss["current_game"], df_h)
+            ss["hydrated_games"].add(ss["current_game"])
+            ss["sheet_rev"] += 1
         ss["game_meta"].setdefault(ss["current_game"], {"quarter":"Q1","opponent":"","type":"Game"})
 with gc2:
     meta = ss["game_meta"].setdefault(ss["current_game"], {"quarter":"Q1","opponent":"","type":"Game"})
-    meta["quarter"] = st.selectbox("Quarter", QUARTERS, index=QUARTERS.index(meta.get("quarter","Q1")))
+    meta["quarter"] = st.selectbox("Quarter", QUARTERS, index=QUARTER_IDX.get(meta.get("quarter","Q1"), 0))
 with gc3:
     meta["opponent"] = st.text_input("Opponent", value=meta.get("opponent",""))
 with gc4:
-    meta["type"] = st.selectbox("Type", ["Game","Scrimmage","Scout"], index=["Game","Scrimmage","Scout"].index(meta.get("type","Game")))
+    meta["type"] = st.selectbox("Type", GAME_TYPES, index=GAME_TYPE_IDX.get(meta.get("type","Game"), 0))
 with gc5:
     if st.button("Next Quarter"):
         meta["quarter"] = next_quarter(meta.get("quarter","Q1"))
         st.toast(f"Quarter → {meta['quarter']}", icon="⏭️")
 with gc6:
     ss["compact_mode"] = st.toggle("Compact", value=ss["compact_mode"], help="Tight spacing + bottom bar room")
+    ss["play_chips"] = st.toggle("Play chips", value=ss["play_chips"], help="One checkbox per play instead of a picker per category")
 
 # --- Quick New Game popover (always available) ---
 try:
@@ -384,17 +793,18 @@ try:
         with _ng1:
             new_name_pop = st.text_input("Name", key="new_game_name_pop")
         with _ng2:
-            new_type_pop = st.selectbox("Type", ["Game","Scrimmage","Scout"], key="new_game_type_pop")
+            new_type_pop = st.selectbox("Type", GAME_TYPES, key="new_game_type_pop")
         with _ng3:
             new_opp_pop = st.text_input("Opponent", key="new_game_opp_pop")
         if st.button("Create", key="new_game_create_pop"):
             if new_name_pop.strip():
-                if new_name_pop not in ss["games"]:
+                if new_name_pop not in ss["games_idx"]:
+                    ss["games_idx"][new_name_pop] = len(ss["games"])
                     ss["games"].append(new_name_pop)
                 ss["game_meta"][new_name_pop] = {"quarter":"Q1","opponent":new_opp_pop,"type":new_type_pop}
                 ss["game_data"].setdefault(new_name_pop, [])
                 if sheets_connected:
-                    sheets_add_game(new_name_pop, new_type_pop, new_opp_pop)
+                    submit_sheets_job("game setup", sheets_add_game, new_name_pop, new_type_pop, new_opp_pop)
                 ss["current_game"] = new_name_pop
                 ss["hide_create_row"] = True  # hide inline row after creation
                 _set_qp(game=new_name_pop)
@@ -416,15 +826,16 @@ if ss.get("hide_create_row", False):
 if not ss["hide_create_row"]:
     cg1, cg2, cg3, cg4 = st.columns([2,1.2,1.8,0.8])
     with cg1: new_name = st.text_input("Create New Game — Name")
-    with cg2: new_type = st.selectbox("Type", ["Game","Scrimmage","Scout"], key="new_type_inline")
+    with cg2: new_type = st.selectbox("Type", GAME_TYPES, key="new_type_inline")
     with cg3: new_opp  = st.text_input("Opponent", key="new_opp_inline")
     with cg4:
         if st.button("Create"):
             if new_name.strip():
-                if new_name not in ss["games"]: ss["games"].append(new_name)
+                if new_name not in ss["games_idx"]:
+                    ss["games_idx"][new_name] = len(ss["games"]); ss["games"].append(new_name)
                 ss["game_meta"][new_name] = {"quarter":"Q1","opponent":new_opp,"type":new_type}
                 ss["game_data"].setdefault(new_name, [])
-                if sheets_connected: sheets_add_game(new_name, new_type, new_opp)
+                if sheets_connected: submit_sheets_job("game setup", sheets_add_game, new_name, new_type, new_opp)
                 ss["current_game"] = new_name; ss["hide_create_row"] = True; _set_qp(game=new_name)
                 st.success(f"Created game: {new_name}"); st.rerun()
             else:
@@ -433,16 +844,17 @@ if not ss["hide_create_row"]:
 # ===== Sidebar: extra Create/Load fallback =====
 with st.sidebar.expander("Create / Load Game", expanded=False):
     new_name_sb = st.text_input("Game Name", key="new_game_name_sb")
-    new_type_sb = st.selectbox("Type", ["Game","Scrimmage","Scout"], key="new_game_type_sb")
+    new_type_sb = st.selectbox("Type", GAME_TYPES, key="new_game_type_sb")
     new_opp_sb  = st.text_input("Opponent", key="new_game_opp_sb")
     if st.button("Start New Game", key="start_game_sb"):
         if new_name_sb.strip():
-            if new_name_sb not in ss["games"]:
+            if new_name_sb not in ss["games_idx"]:
+                ss["games_idx"][new_name_sb] = len(ss["games"])
                 ss["games"].append(new_name_sb)
             ss["game_meta"][new_name_sb] = {"quarter":"Q1","opponent":new_opp_sb,"type":new_type_sb}
             ss["game_data"].setdefault(new_name_sb, [])
             if sheets_connected:
-                sheets_add_game(new_name_sb, new_type_sb, new_opp_sb)
+                submit_sheets_job("game setup", sheets_add_game, new_name_sb, new_type_sb, new_opp_sb)
             ss["current_game"] = new_name_sb
             ss["hide_create_row"] = True
             _set_qp(game=new_name_sb)
@@ -463,50 +875,40 @@ with L:
         total = max(0, min(12*60, total))
         return total//60, total%60
 
+    def nudge_clock(delta:int):
+        m, s = add_seconds(ss["game_clock_min"], int(ss["game_clock_sec"]), delta)
+        ss["game_clock_min"], ss["game_clock_sec"] = m, f"{s:02d}"
+
+    def set_clock_sec(sec:str):
+        ss["game_clock_sec"] = sec
+
     st.markdown('<div class="clock">', unsafe_allow_html=True)
 
-    # minute chips (12 → 0)
-    mcols = st.columns(13)
-    for idx, m in enumerate(range(12, -1, -1)):
-        with mcols[idx]:
-            if st.button(f"{m}", key=f"m_{m}"):
-                ss["game_clock_min"] = m
-    # second chips (0,5,...55)
-    scols = st.columns(12)
-    for idx, s in enumerate(range(0, 60, 5)):
-        with scols[idx]:
-            if st.button(f"{s:02d}", key=f"s_{s}"):
-                ss["game_clock_sec"] = f"{s:02d}"
-
-    # nudges
-    n1, n2, n3, n4, n5, n6 = st.columns(6)
-    with n1:
-        if st.button("−10s"):
-            m, s = add_seconds(ss["game_clock_min"], int(ss["game_clock_sec"]), -10)
-            ss["game_clock_min"], ss["game_clock_sec"] = m, f"{s:02d}"
-    with n2:
-        if st.button("−5s"):
-            m, s = add_seconds(ss["game_clock_min"], int(ss["game_clock_sec"]), -5)
-            ss["game_clock_min"], ss["game_clock_sec"] = m, f"{s:02d}"
-    with n3:
-        if st.button("+5s"):
-            m, s = add_seconds(ss["game_clock_min"], int(ss["game_clock_sec"]), +5)
-            ss["game_clock_min"], ss["game_clock_sec"] = m, f"{s:02d}"
-    with n4:
-        if st.button("+10s"):
-            m, s = add_seconds(ss["game_clock_min"], int(ss["game_clock_sec"]), +10)
-            ss["game_clock_min"], ss["game_clock_sec"] = m, f"{s:02d}"
-    with n5:
-        if st.button(":30"):
-            ss["game_clock_sec"] = "30"
-    with n6:
-        if st.button(":00"):
-            ss["game_clock_sec"] = "00"
+    # minute (12 → 0) and second (0,5,...55) pills: one widget each; default follows the clock so nudges show up
+    sec = ss["game_clock_sec"]
+    m_pick = st.segmented_control("Minutes", CLOCK_MINUTES, default=ss["game_clock_min"])
+    s_pick = st.segmented_control("Seconds", CLOCK_SECONDS, default=sec if sec in CLOCK_SECONDS else None)
+    # clicking the lit pill deselects it (None): keep the clock as is
+    if m_pick is not None:
+        ss["game_clock_min"] = m_pick
+    if s_pick is not None:
+        ss["game_clock_sec"] = s_pick
+
+    # nudges (callbacks run before the pickers render)
+    ncols = st.columns(6)
+    for col, (label, delta) in zip(ncols, (("−10s", -10), ("−5s", -5), ("+5s", +5), ("+10s", +10))):
+        with col:
+            st.button(label, on_click=nudge_clock, args=(delta,))
+    with ncols[4]:
+        st.button(":30", on_click=set_clock_sec, args=("30",))
+    with ncols[5]:
+        st.button(":00", on_click=set_clock_sec, args=("00",))
 
     st.markdown('</div>', unsafe_allow_html=True)
+    st.caption(f"Game clock: **{ss['game_clock_min']}:{ss['game_clock_sec']}**")
 
     st.subheader("👤 Caller")
-    caller = st.radio("Who called it?", ["Coach","Player"], horizontal=True, index=0)
+    caller = st.radio("Who called it?", CALLERS, horizontal=True, index=0)
 
     st.subheader("🔁 2nd Chance")
     second_chance = st.radio("2nd Chance?", ["No","Yes"], horizontal=True, index=0)
@@ -519,14 +921,18 @@ with C:
     st.subheader("📖 Plays (Categorized)")
     search = st.text_input("Search Plays", value="", placeholder="Type to filter plays...")
 
-    selected_all = set(st.session_state.get("ms_plays", set()))
+    # union of every category's chip set (a category hidden by the search keeps its picks)
+    selected_all = set()
+    q = search.lower()
+    low = ss["plays_lower"]  # play -> lowercased, filled lazily; keyed by name, so no sync on playbook edits
     for cat_name, plays in ss["play_categories"].items():
-        show_list = [p for p in plays if (search.lower() in p.lower())] if search else plays
+        show_list = [p for p in plays if q in (low.get(p) or low.setdefault(p, p.lower()))] if q else plays
         if not show_list:
+            selected_all.update(ss.get(f"ms_plays_cat_{cat_name}", ()))
             continue
         expanded_default = cat_name in ("Pace & Space", "2 Man Game")  # open by default
         with st.expander(f"{cat_name} ({len(show_list)})", expanded=expanded_default):
-            subset = chip_check_group("", show_list, key=f"ms_plays_cat_{cat_name}", cols=4, default_selected=[], small=True)
+            subset = chip_check_group("", show_list, key=f"ms_plays_cat_{cat_name}", cols=4, default_selected=[], small=True, multiselect=True)
             selected_all.update(subset)
     st.session_state["ms_plays"] = set(selected_all)
     sel_plays_sorted = sorted(selected_all, key=str.lower)
@@ -534,46 +940,30 @@ with C:
     # Inline +Add Play with category
     try:
         with st.popover("➕ Add Play"):
-            np = st.text_input("Play Name")
+            new_play = st.text_input("Play Name")
             cat_choice = st.selectbox("Category", list(ss["play_categories"].keys()) + [UNCATEGORIZED], index=0)
             if st.button("Add"):
-                if np.strip():
-                    nm = np.strip()
-                    if nm not in ss["plays_master"]:
-                        ss["plays_master"].append(nm); ss["plays_master"].sort()
-                    ss["play_categories"].setdefault(cat_choice, [])
-                    if nm not in ss["play_categories"][cat_choice]:
-                        ss["play_categories"][cat_choice].append(nm)
-                        ss["play_categories"][cat_choice] = sorted(set(ss["play_categories"][cat_choice]))
-                    if sheets_connected:
-                        try:
-                            sh.worksheet("Playbook").append_row(["", nm, cat_choice], value_input_option="USER_ENTERED")
-                        except Exception as e:
-                            st.warning(f"Could not write to Playbook: {e}")
-                    st.success(f"Added play: {nm} → {cat_choice}")
-                    st.rerun()
+                if new_play.strip():
+                    nm = new_play.strip()
+                    if add_play(nm, cat_choice):
+                        st.success(f"Added play: {nm} → {cat_choice}")
+                        st.rerun()
+                    else:
+                        st.info(f"{nm} is already in {cat_choice}.")
                 else:
                     st.warning("Enter a play name.")
     except Exception:
         with st.expander("➕ Add Play"):
-            np = st.text_input("Play Name")
+            new_play = st.text_input("Play Name")
             cat_choice = st.selectbox("Category", list(ss["play_categories"].keys()) + [UNCATEGORIZED], index=0, key="fallback_add_cat")
             if st.button("Add", key="fallback_add_btn"):
-                if np.strip():
-                    nm = np.strip()
-                    if nm not in ss["plays_master"]:
-                        ss["plays_master"].append(nm); ss["plays_master"].sort()
-                    ss["play_categories"].setdefault(cat_choice, [])
-                    if nm not in ss["play_categories"][cat_choice]:
-                        ss["play_categories"][cat_choice].append(nm)
-                        ss["play_categories"][cat_choice] = sorted(set(ss["play_categories"][cat_choice]))
-                    if sheets_connected:
-                        try:
-                            sh.worksheet("Playbook").append_row(["", nm, cat_choice], value_input_option="USER_ENTERED")
-                        except Exception as e:
-                            st.warning(f"Could not write to Playbook: {e}")
-                    st.success(f"Added play: {nm} → {cat_choice}")
-                    st.rerun()
+                if new_play.strip():
+                    nm = new_play.strip()
+                    if add_play(nm, cat_choice):
+                        st.success(f"Added play: {nm} → {cat_choice}")
+                        st.rerun()
+                    else:
+                        st.info(f"{nm} is already in {cat_choice}.")
                 else:
                     st.warning("Enter a play name.")
 
@@ -592,42 +982,38 @@ with R:
 # ===== Build & Push Row =====
 def build_row_from_ui(outcome_text: str):
     def join_pipe(items): return " | ".join(items) if items else ""
-    plays_str = join_pipe(sel_plays_sorted)
-    call_types_str = join_pipe(sel_call_types or ["Half Court"])
+    # joined strings are fresh objects each Confirm; intern them so repeats share one str in game_data
+    plays_str = sys.intern(join_pipe(sel_plays_sorted))
+    call_types_str = sys.intern(join_pipe(sel_call_types or ["Half Court"]))
     sc_str = join_pipe(sel_sc_outcomes) if second_chance == "Yes" else ""
     pts = points_from_outcome(outcome_text)
-    return {
-        "Timestamp": f"{ss['game_clock_min']}:{ss['game_clock_sec']}",
-        "Plays": plays_str,
-        "Credit Play": ss.get("credit_play") or (sel_plays_sorted[0] if sel_plays_sorted else ""),
-        "Call Type": call_types_str,
-        "Caller": caller,
-        "Outcome": outcome_text,
-        "Points": pts,
-        "2nd Chance?": second_chance,
-        "2nd Chance Outcome": sc_str,
-        "Quarter": ss["game_meta"][ss["current_game"]].get("quarter","Q1"),
-        "Opponent": ss["game_meta"][ss["current_game"]].get("opponent",""),
-        "Game Type": ss["game_meta"][ss["current_game"]].get("type","Game"),
-        "Success": "Yes" if is_success(outcome_text) else "No",
-    }
-
-def push_row(r: dict):
+    meta = ss["game_meta"][ss["current_game"]]
+    # positional, in GAME_HEADERS order: the same tuple is the local record and the Sheets row
+    return (
+        f"{ss['game_clock_min']}:{ss['game_clock_sec']}",          # Timestamp
+        plays_str,                                                 # Plays
+        ss.get("credit_play") or (sel_plays_sorted[0] if sel_plays_sorted else ""),  # Credit Play
+        call_types_str,                                            # Call Type
+        caller,                                                    # Caller
+        outcome_text,                                              # Outcome
+        pts,                                                       # Points
+        second_chance,                                             # 2nd Chance?
+        sc_str,                                                    # 2nd Chance Outcome
+        meta.get("quarter","Q1"),                                  # Quarter
+        meta.get("opponent",""),                                   # Opponent
+        meta.get("type","Game"),                                   # Game Type
+        "Yes" if is_success(outcome_text) else "No",               # Success
+    )
+
+def push_row(r: tuple):
     ss["game_data"].setdefault(ss["current_game"], []).append(r)
+    ss["sheet_rev"] += 1
     if sheets_connected:
-        try:
-            sheets_append_play(ss["current_game"], [
-                r["Timestamp"], r["Plays"], r["Credit Play"], r["Call Type"], r["Caller"],
-                r["Outcome"], r["Points"], r["2nd Chance?"], r["2nd Chance Outcome"],
-                r["Quarter"], r["Opponent"], r["Game Type"], r["Success"]
-            ])
-            # rehydrate to confirm sync
-            read_game_from_sheets.clear()
-            df_h = read_game_from_sheets(ss["current_game"])
-            if not df_h.empty:
-                ss["game_data"][ss["current_game"]] = df_h.to_dict("records")
-        except Exception as e:
-            st.error(f"Sheets append failed: {e}")
+        # queue it; the Sheets append goes out in a batch (see flush_pending)
+        ss["pending_sheet_rows"].setdefault(ss["current_game"], []).append(r)
+        if ss["pending_since"] is None:
+            ss["pending_since"] = time.monotonic()
+        flush_pending()
 
 def auto_decrement_clock():
     m = ss["game_clock_min"]; s = int(ss["game_clock_sec"])
@@ -654,13 +1040,32 @@ with qb4:
     if st.button("↩︎ Undo Last"):
         rows = ss["game_data"].get(ss["current_game"], [])
         if rows:
-            rows.pop()
+            popped = rows.pop()
             ss["game_data"][ss["current_game"]] = rows
+            ss["sheet_rev"] += 1
             if sheets_connected:
+                collect_inflight(wait_game=ss["current_game"])  # this game's appends land (or fall back into the buffer) first
+            pend = ss["pending_sheet_rows"].get(ss["current_game"])
+            if pend:
+                # last possession hasn't reached Sheets yet: drop it from the buffer, nothing to rewrite
+                pend.pop()
+                if not pend:
+                    del ss["pending_sheet_rows"][ss["current_game"]]
+                    if not ss["pending_sheet_rows"]: ss["pending_since"] = None
+                st.success("Undid last possession.")
+            elif sheets_connected:
                 try:
-                    sheets_overwrite_game(ss["current_game"], pd.DataFrame(rows))
-                    read_game_from_sheets.clear()
-                    st.success("Undid last possession (synced).")
+                    # the tab can hold rows this session never read (another device, a test row), so re-read it
+                    # and drop only the last row matching the popped possession; never rewrite it from here
+                    ws = get_or_create_game_ws(ss["current_game"])
+                    vals = _with_retry(ws.get_values, "A:M")
+                    hit = next((i for i in range(len(vals) - 1, 0, -1) if same_row(vals[i], popped)), None)
+                    if hit is None:
+                        st.error("Undo sync failed: the last possession isn't on the game tab.")
+                    else:
+                        _with_retry(ws.delete_rows, hit + 1)  # vals is 0-based from row 1
+                        read_game_from_sheets.clear()
+                        st.success("Undid last possession (synced).")
                 except Exception as e:
                     st.error(f"Undo sync failed: {e}")
         else:
@@ -687,7 +1092,10 @@ if ss.get("pending_action"):
                     row = build_row_from_ui(ss["pending_action"])
                     push_row(row)
                     ss["pending_action"] = None
-                    ss["ms_plays"] = set()  # clear selection for next possession
+                    # clear chips for the next possession: drop the group sets *and* the per-chip widget keys,
+                    # otherwise the checkboxes come back ticked and re-add their plays on the rerun
+                    for k in [k for k in ss.keys() if k.startswith(("ms_plays", "ms_sc_outcomes"))]:
+                        del ss[k]
                     auto_decrement_clock()
                     st.success("Possession logged.")
                     st.rerun()
@@ -696,8 +1104,104 @@ if ss.get("pending_action"):
                 ss["pending_action"] = None
                 st.info("Quick action canceled.")
 
+@st.fragment(run_every=SHEETS_FLUSH_SECONDS)
+def pending_sync():
+    """Sends the write buffer and settles background appends while the app sits idle."""
+    flush_pending()
+    n = sum(map(len, ss["pending_sheet_rows"].values())) + sum(len(rows) for _, _, rows in ss["inflight"])
+    if n: st.caption(f"⏳ {n} possession(s) waiting to sync to Sheets")
+
+if sheets_connected and (ss["pending_sheet_rows"] or ss["inflight"] or ss["sheets_jobs"]):
+    pending_sync()
+
 # ===== Live Dashboard + Recent Possessions =====
-df = pd.DataFrame(ss["game_data"].get(ss["current_game"], []))
+# plain Vega-Lite specs (no Altair objects to build and validate each run); the board is passed as data
+def _tip(*fields):
+    return [{"field": f, "type": "nominal" if f == "Play" else "quantitative"} for f in fields]
+
+PPP_SPEC = {
+    "mark": "bar", "height": 280,
+    "encoding": {
+        "x": {"field": "PPP", "type": "quantitative"},
+        "y": {"field": "Play", "type": "nominal", "sort": "-x"},
+        "tooltip": _tip("Play", "Attempts", "PPP", "Freq%", "Success%"),
+    },
+}
+FREQ_SPEC = {
+    "mark": "bar", "height": 240,
+    "encoding": {
+        "x": {"field": "Freq%", "type": "quantitative", "title": "Frequency % of All Possessions"},
+        "y": {"field": "Play", "type": "nominal", "sort": "-x"},
+        "tooltip": _tip("Play", "Freq%", "Attempts"),
+    },
+}
+
+def game_frame(rows:list) -> pd.DataFrame:
+    """Possession tuples -> DataFrame with the repeated label columns stored as categoricals (codes, not strings)."""
+    if not rows: return pd.DataFrame()
+    df = pd.DataFrame(rows, columns=list(GAME_HEADERS))
+    return df.astype({c: "category" for c in GAME_CATEGORY_COLS})
+
+def play_tally(keys, pts:np.ndarray, succ:np.ndarray) -> pd.DataFrame:
+    """Play/Attempts/Points/Successes per distinct key: one factorize + three bincounts (NaN key kept, last)."""
+    codes, plays = pd.factorize(keys, sort=True, use_na_sentinel=False)
+    n = len(plays)
+    return pd.DataFrame({
+        "Play": plays,
+        "Attempts": np.bincount(codes, minlength=n),
+        "Points": np.bincount(codes, weights=pts, minlength=n).astype("int64"),
+        "Successes": np.bincount(codes, weights=succ, minlength=n).astype("int64"),
+    })
+
+def play_metrics(df:pd.DataFrame) -> dict:
+    """Per-play Attempts/Points/PPP/Freq%/Success% for both bases, each sorted PPP desc then Attempts desc."""
+    # success flag + typed Points as plain arrays for the bincounts below (no working copy of df)
+    pts = pd.to_numeric(df["Points"], errors="coerce").fillna(0).to_numpy(dtype="int32")
+    succ = df["Success"].astype(str).str.strip().str.lower().eq("yes").to_numpy(dtype="int8")
+
+    # CREDIT PLAY basis
+    has_credit = ((df["Credit Play"].notna()) & (df["Credit Play"].astype(str) != "")).to_numpy()
+    grp_credit = pd.DataFrame()
+    if has_credit.any():
+        grp_credit = play_tally(df["Credit Play"].astype(str).to_numpy()[has_credit], pts[has_credit], succ[has_credit])
+        total_poss_credit = int(has_credit.sum())
+        grp_credit["PPP"] = grp_credit["Points"] / grp_credit["Attempts"]
+        grp_credit["Freq%"] = 100.0 * grp_credit["Attempts"] / max(total_poss_credit, 1)
+        grp_credit["Success%"] = 100.0 * grp_credit["Successes"] / grp_credit["Attempts"]
+
+    # ALL TAGGED PLAYS basis (explode by plays in possession)
+    grp_all = pd.DataFrame()
+    if df["Plays"].notna().any():
+        plays = df["Plays"].astype(str)
+        if plays.str.contains("|", regex=False).any():
+            plays = plays.str.split("|").explode()
+        play = plays.str.strip()
+        blank = play.eq("")
+        # blank names drop out, but a possession with no named play still counts once, under a NaN play
+        drop = blank & (~blank.groupby(level=0).transform("all") | play.index.duplicated())
+        play = play[~drop].mask(blank[~drop])
+        rows = df.index.get_indexer(play.index)  # each exploded play -> its possession's position
+        grp_all = play_tally(play.to_numpy(), pts[rows], succ[rows])
+        total_poss_all = len(df)  # denom = total possessions
+        grp_all["PPP"] = grp_all["Points"] / grp_all["Attempts"]
+        grp_all["Freq%"] = 100.0 * grp_all["Attempts"] / max(total_poss_all, 1)
+        grp_all["Success%"] = 100.0 * grp_all["Successes"] / grp_all["Attempts"]
+
+    out = {}
+    for basis, grp in (("All Tagged Plays", grp_all), ("Credit Play", grp_credit)):
+        if not grp.empty:
+            # PPP desc, then Attempts desc — permutation only, no per-column sort copies
+            grp = grp.iloc[np.lexsort((-grp["Attempts"].to_numpy(), -grp["PPP"].to_numpy()))]
+        out[basis] = grp
+    return out
+
+# frame + aggregates only change with the data: rebuild on a new game / sheet_rev, reuse on every other rerun
+_dash_key = (ss["current_game"], ss["sheet_rev"])
+if ss.get("dash_memo", (None,))[0] != _dash_key:
+    _df = game_frame(ss["game_data"].get(ss["current_game"], []))
+    ss["dash_memo"] = (_dash_key, _df, play_metrics(_df) if not _df.empty else {})
+_, df, metrics = ss["dash_memo"]
+
 st.subheader("📊 Live: Play Metrics & Recent Possessions")
 DL, DR = st.columns([1.2, 1.0])
 
@@ -705,49 +1209,12 @@ with DL:
     if df.empty:
         st.info("No data yet for visuals.")
     else:
-        vis = df.copy()
-        vis["Success"] = vis["Success"].fillna("").astype(str)
-
-        def _success_to_bool(s): return str(s).strip().lower() == "yes"
-
-        # CREDIT PLAY basis
-        cred = vis[(vis["Credit Play"].notna()) & (vis["Credit Play"].astype(str) != "")]
-        grp_credit = pd.DataFrame()
-        if not cred.empty:
-            grp_credit = cred.groupby("Credit Play", dropna=False).agg(
-                Attempts=("Points", "count"),
-                Points=("Points", "sum"),
-                Successes=("Success", lambda s: sum(_success_to_bool(x) for x in s))
-            ).reset_index().rename(columns={"Credit Play": "Play"})
-            total_poss_credit = len(cred)
-            grp_credit["PPP"] = grp_credit["Points"] / grp_credit["Attempts"]
-            grp_credit["Freq%"] = 100.0 * grp_credit["Attempts"] / max(total_poss_credit, 1)
-            grp_credit["Success%"] = 100.0 * grp_credit["Successes"] / grp_credit["Attempts"]
-
-        # ALL TAGGED PLAYS basis (explode by plays in possession)
-        grp_all = pd.DataFrame()
-        if vis["Plays"].notna().any():
-            tmp = vis.copy()
-            tmp["PlaysList"] = tmp["Plays"].astype(str).str.split("|")
-            tmp["PlaysList"] = tmp["PlaysList"].apply(lambda lst: [p.strip() for p in lst if p.strip()])
-            exploded = tmp.explode("PlaysList").rename(columns={"PlaysList":"Play"})
-            grp_all = exploded.groupby("Play", dropna=False).agg(
-                Attempts=("Points", "count"),
-                Points=("Points", "sum"),
-                Successes=("Success", lambda s: sum(_success_to_bool(x) for x in s))
-            ).reset_index()
-            total_poss_all = len(vis)  # denom = total possessions
-            grp_all["PPP"] = grp_all["Points"] / grp_all["Attempts"]
-            grp_all["Freq%"] = 100.0 * grp_all["Attempts"] / max(total_poss_all, 1)
-            grp_all["Success%"] = 100.0 * grp_all["Successes"] / grp_all["Attempts"]
-
         mode = st.radio("Metric basis", ["All Tagged Plays", "Credit Play"], horizontal=True, index=0)
-        grp = grp_all if mode == "All Tagged Plays" else grp_credit
+        grp = metrics[mode]
 
         if grp.empty:
             st.info("No data to display for the selected mode.")
         else:
-            grp = grp.sort_values(["PPP", "Attempts"], ascending=[False, False])
             cA, cB, cC = st.columns([1, 1, 1])
             with cA:
                 min_attempts = st.slider("Min Attempts", 1, 15, 3)
@@ -758,29 +1225,8 @@ with DL:
 
             board = grp[grp["Attempts"] >= min_attempts].head(topN)
 
-            chart_ppp = (
-                alt.Chart(board)
-                .mark_bar()
-                .encode(
-                    x=alt.X("PPP:Q"),
-                    y=alt.Y("Play:N", sort="-x"),
-                    tooltip=["Play", "Attempts", "PPP", "Freq%", "Success%"]
-                )
-                .properties(height=280, title=f"PPP by Play — {mode}")
-            )
-            st.altair_chart(chart_ppp, use_container_width=True)
-
-            chart_freq = (
-                alt.Chart(board)
-                .mark_bar()
-                .encode(
-                    x=alt.X("Freq%:Q", title="Frequency % of All Possessions"),
-                    y=alt.Y("Play:N", sort="-x"),
-                    tooltip=["Play", "Freq%", "Attempts"]
-                )
-                .properties(height=240, title=f"Frequency % by Play — {mode}")
-            )
-            st.altair_chart(chart_freq, use_container_width=True)
+            st.vega_lite_chart(board, {**PPP_SPEC, "title": f"PPP by Play — {mode}"}, use_container_width=True)
+            st.vega_lite_chart(board, {**FREQ_SPEC, "title": f"Frequency % by Play — {mode}"}, use_container_width=True)
 
             if show_table:
                 st.subheader("Per-Play Metrics")
@@ -792,10 +1238,45 @@ with DR:
     if df.empty:
         st.info("No data.")
     else:
-        last10 = df.tail(10).copy()
-        last10 = last10[["Quarter","Timestamp","Plays","Outcome","Points","Caller","Call Type"]]
+        # column selection already returns a new frame; no extra copy of the tail
+        last10 = df.tail(10)[["Quarter","Timestamp","Plays","Outcome","Points","Caller","Call Type"]]
         st.dataframe(last10, use_container_width=True, height=400)
 
+@st.fragment
+def playbook_editor():
+    """Edit/Delete Plays: editing cells reruns only this block; Save writes once, then reruns the app."""
+    if not st.checkbox("Edit/Delete Plays"): return
+    flat = []
+    for cat, lst in ss["play_categories"].items():
+        for p in lst:
+            flat.append({"Play Name": p, "Category": cat})
+    pb_df = pd.DataFrame(flat).drop_duplicates().sort_values(["Category","Play Name"]).reset_index(drop=True)
+    ed = st.data_editor(pb_df, hide_index=True, use_container_width=True, height=260, key="playbook_editor")
+    if st.button("💾 Save Playbook"):
+        # same shape as the startup hydration: vectorized strip, then names grouped by category in one pass
+        nms = ed["Play Name"].fillna("").astype(str).str.strip()
+        cts = ed["Category"].fillna("").astype(str).str.strip().replace("", UNCATEGORIZED)
+        keep = nms.ne("")
+        new_master = sorted(set(nms[keep]))
+        new_cat = {ct: sorted(set(g)) for ct, g in nms[keep].groupby(cts[keep], sort=False)}
+        # compare in the editor's shape: the seeded defaults keep their hand-picked (unsorted) order
+        cur_cat = {ct: sorted(set(lst)) for ct, lst in ss["play_categories"].items() if lst}
+        if new_master == ss["plays_master"] and new_cat == cur_cat:
+            st.info("No changes.")
+            return
+        ss["plays_master"] = new_master
+        ss["play_categories"] = new_cat
+        if sheets_connected:
+            try:
+                sheets_save_playbook([["", nm, ct] for ct, lst in ss["play_categories"].items() for nm in lst])
+            except Exception as e:
+                st.warning(f"Save failed: {e}")
+                return
+        # the saved table is the editor's new base: drop its edit deltas so they aren't replayed on top
+        ss.pop("playbook_editor", None)
+        st.toast("Playbook saved.")
+        st.rerun()  # the play pickers outside this fragment need the new playbook
+
 # ===== Sidebar: Playbook Manager =====
 with st.sidebar:
     st.header("Playbook Manager")
@@ -804,102 +1285,94 @@ with st.sidebar:
     if st.button("➕ Add Play"):
         if np2.strip():
             nm = np2.strip()
-            if nm not in ss["plays_master"]:
-                ss["plays_master"].append(nm); ss["plays_master"].sort()
-            ss["play_categories"].setdefault(cat2, [])
-            if nm not in ss["play_categories"][cat2]:
-                ss["play_categories"][cat2].append(nm)
-                ss["play_categories"][cat2] = sorted(set(ss["play_categories"][cat2]))
-            if sheets_connected:
-                try:
-                    sh.worksheet("Playbook").append_row(["", nm, cat2], value_input_option="USER_ENTERED")
-                except Exception as e:
-                    st.warning(f"Could not write to Playbook: {e}")
-            st.success(f"Added play: {nm} → {cat2}")
-            st.experimental_rerun()
+            if add_play(nm, cat2):
+                st.success(f"Added play: {nm} → {cat2}")
+                st.rerun()
+            else:
+                st.info(f"{nm} is already in {cat2}.")
         else:
             st.warning("Enter a play name.")
 
     st.divider()
-    if st.checkbox("Edit/Delete Plays"):
-        flat = []
-        for cat, lst in ss["play_categories"].items():
-            for p in lst:
-                flat.append({"Play Name": p, "Category": cat})
-        pb_df = pd.DataFrame(flat).drop_duplicates().sort_values(["Category","Play Name"]).reset_index(drop=True)
-        ed = st.data_editor(pb_df, hide_index=True, use_container_width=True, height=260)
-        if st.button("💾 Save Playbook"):
-            new_cat = {}
-            new_master = []
-            for _, r in ed.iterrows():
-                nm = str(r.get("Play Name","")).strip()
-                ct = str(r.get("Category","")).strip() or UNCATEGORIZED
-                if nm:
-                    new_master.append(nm)
-                    new_cat.setdefault(ct, []).append(nm)
-            new_master = sorted(set(new_master))
-            new_cat = {k: sorted(set(v)) for k,v in new_cat.items()}
-            ss["plays_master"] = new_master
-            ss["play_categories"] = new_cat
-            if sheets_connected:
-                try:
-                    ws = sh.worksheet("Playbook")
-                    ws.clear()
-                    ws.update("A1:C1", [["Code","Play Name","System"]])
-                    rows = [["", nm, ct] for ct, lst in ss["play_categories"].items() for nm in lst]
-                    if rows:
-                        ws.update(f"A2:C{len(rows)+1}", rows)
-                except Exception as e:
-                    st.warning(f"Save failed: {e}")
-            st.success("Playbook saved.")
-
-# ===== Sheets tools (status & postgame) =====
-st.divider()
-with st.expander("🧰 Google Sheets — Status & Postgame Upload"):
-    if sheets_connected:
-        st.success("✅ Connected to Google Sheets.")
-        t1, t2, t3 = st.columns([1,1,2])
-        with t1:
-            if st.button("🔎 List Worksheets"):
-                names = [ws.title for ws in sh.worksheets()]
-                st.write(names)
-        with t2:
-            if st.button("🧪 Test Write (current game)"):
-                try:
-                    sheets_append_play(ss["current_game"], [
-                        "TEST","Test Play | Pistol","Pistol","Half Court","Coach",
-                        "Turnover",0,"No","", "Q1","Test Opp","Game","No"
-                    ])
-                    read_game_from_sheets.clear()
-                    st.success("Wrote a test row to the game worksheet.")
-                except Exception as e:
-                    st.error(f"Test write failed: {e}")
-        with t3:
-            st.caption("If you don't see new tabs, share the Sheet with your service account email.")
-
-        st.markdown("**Postgame CSV → Google Sheet**")
+    playbook_editor()
+
+@st.fragment(run_every=1)
+def upload_progress():
+    """Polls the background upload; a full rerun once it finishes so the result and fresh data render."""
+    job = ss.get("upload_job")
+    if job is None: return
+    if job[0].done():
+        st.rerun()
+    st.info(f"⏳ Uploading into '{job[1]}'… you can keep tagging.")
+
+@st.fragment
+def sheets_panel():
+    """Status buttons + postgame upload: their clicks and the form submit rerun only this panel."""
+    st.success("✅ Connected to Google Sheets.")
+    t1, t2, t3 = st.columns([1,1,2])
+    with t1:
+        if st.button("🔎 List Worksheets"):
+            st.write(sheets_ws_titles())
+    with t2:
+        if st.button("🧪 Test Write (current game)"):
+            try:
+                sheets_append_play(ss["current_game"], [
+                    "TEST","Test Play | Pistol","Pistol","Half Court","Coach",
+                    "Turnover",0,"No","", "Q1","Test Opp","Game","No"
+                ])
+                read_game_from_sheets.clear()
+                st.success("Wrote a test row to the game worksheet.")
+            except Exception as e:
+                st.error(f"Test write failed: {e}")
+    with t3:
+        st.caption("If you don't see new tabs, share the Sheet with your service account email.")
+
+    st.markdown("**Postgame CSV → Google Sheet**")
+    job = ss.get("upload_job")
+    if job is not None and job[0].done():
+        # finished since the last run: report it here, on the script thread
+        fut, job_game = ss.pop("upload_job")
+        try:
+            n_up, missing = fut.result()
+            if missing:
+                st.error(f"CSV missing columns: {', '.join(missing)}")
+            elif n_up:
+                # the tab changed under this session: take the sheet's copy, even for a game with no local rows yet
+                collect_inflight(wait_game=job_game)  # same as a game switch: settle this game's appends first
+                read_game_from_sheets.clear()
+                ss["game_data"][job_game] = game_records(job_game, read_game_from_sheets(job_game))
+                ss["hydrated_games"].add(job_game)
+                ss["sheet_rev"] += 1
+                st.success(f"Uploaded {n_up} rows into '{job_game}'.")
+            else:
+                st.warning("CSV has no rows — nothing uploaded.")
+        except Exception as e:
+            st.error(f"Upload failed: {e}")
+    # one form: picking the file / toggling overwrite / typing a name don't rerun the app until submit
+    with st.form("csv_upload", clear_on_submit=True):
         up = st.file_uploader("Upload a CSV exported from this app", type=["csv"])
         pgcols = st.columns([2,1])
         with pgcols[0]:
             target_game = st.text_input("Game name to write into (creates if missing)", value=ss["current_game"])
         with pgcols[1]:
             do_overwrite = st.checkbox("Overwrite game tab (recommended)", value=True)
-        if up is not None and st.button("⬆️ Push CSV to Google Sheet"):
-            try:
-                df_up = pd.read_csv(up)
-                if do_overwrite:
-                    sheets_overwrite_game(target_game, df_up)
-                else:
-                    for r in df_up.fillna("").to_dict(orient="records"):
-                        sheets_append_play(target_game, [
-                            r.get("Timestamp",""), r.get("Plays",""), r.get("Credit Play",""), r.get("Call Type",""), r.get("Caller",""),
-                            r.get("Outcome",""), r.get("Points",0), r.get("2nd Chance?",""), r.get("2nd Chance Outcome",""),
-                            r.get("Quarter",""), r.get("Opponent",""), r.get("Game Type",""), r.get("Success","")
-                        ])
-                read_game_from_sheets.clear()
-                st.success(f"Uploaded {len(df_up)} rows into '{target_game}'.")
-            except Exception as e:
-                st.error(f"Upload failed: {e}")
+        submitted = st.form_submit_button("⬆️ Push CSV to Google Sheet", disabled="upload_job" in ss)
+    if submitted:
+        if up is None:
+            st.warning("Choose a CSV file first.")
+        elif "upload_job" in ss:
+            st.warning("An upload is already running — wait for it to finish.")
+        else:
+            # Sheets writes happen on the executor; this run (and the rest of the UI) returns straight away
+            ss["upload_job"] = (sheets_executor().submit(upload_csv_to_sheets, up, target_game, do_overwrite), target_game)
+    if "upload_job" in ss:
+        upload_progress()
+
+# ===== Sheets tools (status & postgame) =====
+st.divider()
+with st.expander("🧰 Google Sheets — Status & Postgame Upload"):
+    if sheets_connected:
+        sheets_panel()
     else:
         st.warning("⚠️ Not connected to Google Sheets.")
         if sheets_error:
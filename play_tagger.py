@@ -68,8 +68,10 @@ if st.session_state.data:
     df = pd.DataFrame(st.session_state.data)
     st.dataframe(df)
 
-    # Download CSV
-    csv = df.to_csv(index=False).encode('utf-8')
-    st.download_button("⬇️ Download CSV", data=csv, file_name="play_tags.csv", mime="text/csv")
+    # Download CSV (encoded only when the button is clicked)
+    st.download_button(
+        "⬇️ Download CSV", data=lambda: df.to_csv(index=False).encode('utf-8'),
+        file_name="play_tags.csv", mime="text/csv"
+    )
 streamlit
 pandas